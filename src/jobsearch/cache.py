@@ -0,0 +1,58 @@
+"""
+Persistent key-value cache backed by SQLite
+"""
+
+from typing import Any, Optional
+import os
+import sqlite3
+import time
+import orjson
+
+class DiskCache:
+    """Stores JSON-serializable values on disk with an optional time-to-live"""
+
+    def __init__(self, path: str, ttl: Optional[float] = None):
+        """
+        Open (or create) a cache
+
+        Args:
+            path: Path of the SQLite database file
+            ttl: Seconds after which entries expire (default: never)
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.ttl = ttl
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or expired"""
+        row = self._conn.execute(
+            "SELECT value, created_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return default
+
+        value, created_at = row
+        if self.ttl is not None and time.time() - created_at > self.ttl:
+            return default
+        return orjson.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a value under key, replacing any existing entry"""
+        self._conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, created_at) VALUES (?, ?, ?)",
+            (key, orjson.dumps(value).decode(), time.time())
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        """Close the underlying database connection"""
+        self._conn.close()
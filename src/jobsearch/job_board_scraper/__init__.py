@@ -1,5 +1,6 @@
+from .base import JobScraper, JobRecord
 from .linkedin import LinkedInScraper
 from .climatebase import ClimatebaseScraper
 from .google import GoogleJobSearcher
 
-__all__ = ["LinkedInScraper", "ClimatebaseScraper", "GoogleJobSearcher"]
\ No newline at end of file
+__all__ = ["JobScraper", "JobRecord", "LinkedInScraper", "ClimatebaseScraper", "GoogleJobSearcher"]
\ No newline at end of file
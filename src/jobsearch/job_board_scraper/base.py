@@ -1,29 +1,183 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Callable, Awaitable, AsyncIterator
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
+import asyncio
+import codecs
 import logging
+from urllib.parse import urlsplit
+import aiohttp
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+from lxml import etree
+from jobsearch.rate_limit import RateLimiter
+
+# Ask for Brotli, which compresses HTML better than gzip, only when aiohttp can decode it
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "br, gzip, deflate"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+def css_class(name: str) -> str:
+    """XPath predicate matching elements that have the given CSS class"""
+    # The plain substring test is cheap and rejects almost every element,
+    # so the exact class token comparison only runs on likely matches
+    return (f"(contains(@class, '{name}') and "
+            f"contains(concat(' ', normalize-space(@class), ' '), ' {name} '))")
+
+def field_text(path: str) -> etree.XPath:
+    """Compiled XPath returning the trimmed text of the first element matching path"""
+    # XPath expressions are compiled once and evaluated in C for every job card,
+    # with normalize-space() trimming field text without a Python-level strip().
+    # It only knows ASCII whitespace, so non-breaking spaces are turned into spaces first
+    return etree.XPath(f"normalize-space(translate({path}, '\u00a0', ' '))", smart_strings=False)
+
+@dataclass(slots=True)
+class JobRecord:
+    """A job posting in the standard format produced by every scraper"""
+    title: str = ""
+    company: str = ""
+    location: str = ""
+    description: str = ""
+    url: str = ""
+    salary: str = "Not specified"
+    date_posted: str = ""
+    source: str = ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to a job dictionary"""
+        # A flat copy of the slots, as dataclasses.asdict recursively deep-copies every field
+        return {name: getattr(self, name) for name in self.__slots__}
 
 class JobScraper(ABC):
     """Abstract base class for job details"""
-    
+
+    # Default headers sent with every request
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+        "Accept-Encoding": ACCEPT_ENCODING
+    }
+    # Maximum number of concurrent requests to a job board
+    max_concurrency = 8
+    # Maximum number of pooled connections across all hosts
+    max_connections = 20
+    # Sustained rate limit of one request every request_delay seconds,
+    # allowing bursts of up to request_burst requests
+    request_delay = 2
+    request_burst = 4
+    # Rate limiters shared by all scraper instances, keyed by host
+    _rate_limiters: Dict[str, RateLimiter] = {}
+    # Size of the chunks fed to the incremental HTML parser
+    chunk_size = 16384
+    # Retry policy for connection errors and transient server errors
+    max_retries = 3
+    retry_backoff = 0.3
+    retry_statuses = frozenset({429, 500, 502, 503, 504})
+
     def __init__(self, keywords: List[str]):
         self.keywords = keywords
         self.logger = logging.getLogger(self.__class__.__name__)
-    
-    @abstractmethod
-    def search(self) -> List[Dict[str, Any]]:
+
+    def search(self, *args, **kwargs) -> List[Dict[str, Any]]:
         """Search for jobs and return a list of job dictionaries"""
+        return [job.to_dict() for job in asyncio.run(self.search_async(*args, **kwargs))]
+
+    @abstractmethod
+    async def search_async(self, *args, **kwargs) -> List[JobRecord]:
+        """Asynchronously search for jobs and return a list of job records"""
         pass
-    
-    def _standardize_job(self, job_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Standardize job data format"""
-        standard_job = {
-            "title": job_data.get("title", ""),
-            "company": job_data.get("company", ""),
-            "location": job_data.get("location", ""),
-            "description": job_data.get("description", ""),
-            "url": job_data.get("url", ""),
-            "salary": job_data.get("salary", "Not specified"),
-            "date_posted": job_data.get("date_posted", ""),
-            "source": self.__class__.__name__
-        }
-        return standard_job
\ No newline at end of file
+
+    async def search_stream(self, *args, **kwargs) -> AsyncIterator[List[JobRecord]]:
+        """
+        Search for jobs, yielding pages of job records as they become available.
+        Scrapers that can't produce partial results yield them all as a single page
+        """
+        yield await self.search_async(*args, **kwargs)
+
+    def _rate_limiter(self, url: str) -> RateLimiter:
+        """Return the rate limiter shared by every request to the URL's host"""
+        host = urlsplit(url).netloc
+        limiter = self._rate_limiters.get(host)
+        if limiter is None:
+            limiter = self._rate_limiters[host] = RateLimiter(self.request_delay, self.request_burst)
+        return limiter
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        """Create an HTTP session that keeps connections alive between requests"""
+        connector = aiohttp.TCPConnector(
+            limit=self.max_connections,
+            limit_per_host=self.max_concurrency
+        )
+        return aiohttp.ClientSession(connector=connector, headers=self.headers)
+
+    async def _fetch_soup(self, session: aiohttp.ClientSession,
+                          semaphore: asyncio.BoundedSemaphore,
+                          url: str,
+                          parse_only: Optional[SoupStrainer] = None) -> Optional[BeautifulSoup]:
+        """Fetch a page, returning it parsed with BeautifulSoup or None if the request failed"""
+        async def read(response: aiohttp.ClientResponse) -> BeautifulSoup:
+            return BeautifulSoup(await response.read(), "lxml", parse_only=parse_only,
+                                 from_encoding=self._declared_charset(response))
+        return await self._request(session, semaphore, url, read)
+
+    async def _fetch_tree(self, session: aiohttp.ClientSession,
+                          semaphore: asyncio.BoundedSemaphore,
+                          url: str) -> Optional[etree._Element]:
+        """Fetch a page, returning its parsed HTML tree or None if the request failed"""
+        return await self._request(session, semaphore, url, self._parse_stream)
+
+    async def _parse_stream(self, response: aiohttp.ClientResponse) -> etree._Element:
+        """Parse a response body incrementally, overlapping parsing with the download"""
+        parser = etree.HTMLParser(encoding=self._declared_charset(response))
+        async for chunk in response.content.iter_chunked(self.chunk_size):
+            parser.feed(chunk)
+        return parser.close()
+
+    @staticmethod
+    def _declared_charset(response: aiohttp.ClientResponse) -> Optional[str]:
+        """
+        Return the charset declared in the Content-Type header, so parsers can skip
+        encoding detection. Returns None to fall back to detection if it is missing or unknown.
+        """
+        if response.charset is None:
+            return None
+        try:
+            return codecs.lookup(response.charset).name
+        except LookupError:
+            return None
+
+    async def _request(self, session: aiohttp.ClientSession,
+                       semaphore: asyncio.BoundedSemaphore,
+                       url: str,
+                       read: Callable[[aiohttp.ClientResponse], Awaitable[Any]]) -> Optional[Any]:
+        """GET a URL with retries, returning read(response) or None if the request failed"""
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1))
+                await self._rate_limiter(url).acquire()
+                try:
+                    async with session.get(url) as response:
+                        if response.status in self.retry_statuses and attempt < self.max_retries:
+                            self.logger.warning(f"Retrying {url}: {response.status}")
+                            continue
+                        if response.status != 200:
+                            self.logger.error(f"Failed to fetch {url}: {response.status}")
+                            result = None
+                        else:
+                            result = await read(response)
+                        break
+                except aiohttp.ClientConnectionError as e:
+                    if attempt == self.max_retries:
+                        raise
+                    self.logger.warning(f"Retrying {url}: {e}")
+
+        return result
+
+    @staticmethod
+    def _txt(elem: Optional[Tag]) -> str:
+        """Return an element's text with whitespace trimmed in a single pass, or "" if missing"""
+        return elem.get_text(" ", strip=True) if elem is not None else ""
+
+    def _standardize_job(self, **job_data: str) -> JobRecord:
+        """Build a job record in the standard format"""
+        return JobRecord(source=self.__class__.__name__, **job_data)
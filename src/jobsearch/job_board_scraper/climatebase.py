@@ -1,62 +1,65 @@
-from bs4 import BeautifulSoup
-import requests
-import time
-from typing import List, Dict, Any
-from jobsearch.job_board_scraper.base import JobScraper
+from lxml import etree
+import aiohttp
+import asyncio
+from typing import List
+from jobsearch.job_board_scraper.base import JobScraper, JobRecord, css_class, field_text
+
+_JOB_CARD = etree.XPath(f"//*[{css_class('job-card')}]")
+_TITLE = field_text(f".//*[{css_class('job-title')}]")
+_COMPANY = field_text(f".//*[{css_class('organization-name')}]")
+_LOCATION = field_text(f".//*[{css_class('job-location')}]")
+_LINK = etree.XPath(f"string(.//a[{css_class('job-card-link')}]/@href)", smart_strings=False)
+_DESCRIPTION = field_text(f".//*[{css_class('job-description-preview')}]")
 
 class ClimatebaseScraper(JobScraper):
     """Scrapes Climatebase for climate-related jobs"""
-    
-    def search(self) -> List[Dict[str, Any]]:
+
+    async def search_async(self) -> List[JobRecord]:
+        semaphore = asyncio.BoundedSemaphore(self.max_concurrency)
+
+        async with self._create_session() as session:
+            results = await asyncio.gather(
+                *[self._search_one(session, semaphore, keyword) for keyword in self.keywords]
+            )
+
+        return [job for jobs in results for job in jobs]
+
+    async def _search_one(self, session: aiohttp.ClientSession,
+                          semaphore: asyncio.BoundedSemaphore,
+                          keyword: str) -> List[JobRecord]:
         jobs = []
-        
-        for keyword in self.keywords:
-            self.logger.info(f"Searching Climatebase for: {keyword}")
-            
-            try:
-                # Build search URL
-                search_term = keyword.replace(" ", "+")
-                url = f"https://climatebase.org/jobs?l=&q={search_term}&p=0&remote=false"
-                
-                headers = {
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-                }
-                response = requests.get(url, headers=headers)
-                
-                if response.status_code != 200:
-                    self.logger.error(f"Failed to fetch Climatebase jobs: {response.status_code}")
-                    continue
-                
-                # Parse HTML
-                soup = BeautifulSoup(response.text, "html.parser")
-                job_cards = soup.select(".job-card")
-                
-                for card in job_cards:
-                    try:
-                        title_elem = card.select_one(".job-title")
-                        company_elem = card.select_one(".organization-name")
-                        location_elem = card.select_one(".job-location")
-                        link_elem = card.select_one("a.job-card-link")
-                        
+        self.logger.info(f"Searching Climatebase for: {keyword}")
+
+        try:
+            # Build search URL
+            search_term = keyword.replace(" ", "+")
+            url = f"https://climatebase.org/jobs?l=&q={search_term}&p=0&remote=false"
+
+            tree = await self._fetch_tree(session, semaphore, url)
+            if tree is None:
+                return jobs
+
+            job_cards = _JOB_CARD(tree)
+
+            for card in job_cards:
+                try:
+                    link = _LINK(card)
+
+                    job = self._standardize_job(
+                        title=_TITLE(card),
+                        company=_COMPANY(card),
+                        location=_LOCATION(card),
+                        url="https://climatebase.org" + link if link else "",
                         # Get partial description if available
-                        desc_elem = card.select_one(".job-description-preview")
-                        
-                        job = {
-                            "title": title_elem.text.strip() if title_elem else "",
-                            "company": company_elem.text.strip() if company_elem else "",
-                            "location": location_elem.text.strip() if location_elem else "",
-                            "url": "https://climatebase.org" + link_elem.get("href") if link_elem else "",
-                            "description": desc_elem.text.strip() if desc_elem else "",
-                        }
-                        
-                        if job["title"] and job["url"]:
-                            jobs.append(self._standardize_job(job))
-                    except Exception as e:
-                        self.logger.error(f"Error parsing Climatebase job card: {e}")
-                
-                time.sleep(2)
-                
-            except Exception as e:
-                self.logger.error(f"Error in Climatebase search: {e}")
-        
-        return jobs
\ No newline at end of file
+                        description=_DESCRIPTION(card),
+                    )
+
+                    if job.title and job.url:
+                        jobs.append(job)
+                except Exception as e:
+                    self.logger.error(f"Error parsing Climatebase job card: {e}")
+
+        except Exception as e:
+            self.logger.error(f"Error in Climatebase search: {e}")
+
+        return jobs
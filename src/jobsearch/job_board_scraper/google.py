@@ -1,59 +1,65 @@
-from bs4 import BeautifulSoup
-import requests
-import time
-from typing import List, Dict, Any
-from jobsearch.job_board_scraper.base import JobScraper
+from lxml import etree
+import aiohttp
+import asyncio
+from typing import List
+from jobsearch.job_board_scraper.base import JobScraper, JobRecord, css_class, field_text
+
+_JOB_SECTION = etree.XPath(f"//*[{css_class('iFjolb')}]")
+_TITLE = field_text(f".//*[{css_class('BjJfJf')}]")
+_COMPANY = field_text(f".//*[{css_class('vNEEBe')}]")
+_LOCATION = field_text(f".//*[{css_class('Qk80Jf')}]")
 
 class GoogleJobSearcher(JobScraper):
     """Uses Google's job search results"""
-    
-    def search(self) -> List[Dict[str, Any]]:
+
+    async def search_async(self) -> List[JobRecord]:
+        semaphore = asyncio.BoundedSemaphore(self.max_concurrency)
+
+        async with self._create_session() as session:
+            results = await asyncio.gather(
+                *[self._search_one(session, semaphore, keyword) for keyword in self.keywords]
+            )
+
+        return [job for jobs in results for job in jobs]
+
+    async def _search_one(self, session: aiohttp.ClientSession,
+                          semaphore: asyncio.BoundedSemaphore,
+                          keyword: str) -> List[JobRecord]:
         jobs = []
-        
-        for keyword in self.keywords:
-            self.logger.info(f"Searching Google for: {keyword}")
-            
-            try:
-                # Use Google's jobs search
-                search_term = keyword.replace(" ", "+")
-                url = f"https://www.google.com/search?q={search_term}+jobs&ibp=htl;jobs"
-                
-                headers = {
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-                }
-                response = requests.get(url, headers=headers)
-                
-                # Note: Google's job results are loaded dynamically with JavaScript
-                # This simple scraper won't work perfectly - you may need Selenium for this
-                # This is a simplified implementation for illustration
-                
-                soup = BeautifulSoup(response.text, "html.parser")
-                
-                # Look for any job-like data in the initial HTML
-                job_sections = soup.select(".iFjolb")
-                
-                for section in job_sections[:5]:  # Limit to avoid too many results
-                    try:
-                        title_elem = section.select_one(".BjJfJf")
-                        company_elem = section.select_one(".vNEEBe")
-                        location_elem = section.select_one(".Qk80Jf")
-                        
-                        job = {
-                            "title": title_elem.text.strip() if title_elem else "",
-                            "company": company_elem.text.strip() if company_elem else "",
-                            "location": location_elem.text.strip() if location_elem else "",
-                            "url": url,  # Direct link not easily available
-                            "description": "See Google Jobs listing for details",
-                        }
-                        
-                        if job["title"]:
-                            jobs.append(self._standardize_job(job))
-                    except Exception as e:
-                        self.logger.error(f"Error parsing Google job section: {e}")
-                
-                time.sleep(2)
-                
-            except Exception as e:
-                self.logger.error(f"Error in Google job search: {e}")
-        
-        return jobs
\ No newline at end of file
+        self.logger.info(f"Searching Google for: {keyword}")
+
+        try:
+            # Use Google's jobs search
+            search_term = keyword.replace(" ", "+")
+            url = f"https://www.google.com/search?q={search_term}+jobs&ibp=htl;jobs"
+
+            tree = await self._fetch_tree(session, semaphore, url)
+            if tree is None:
+                return jobs
+
+            # Note: Google's job results are loaded dynamically with JavaScript
+            # This simple scraper won't work perfectly - you may need Selenium for this
+            # This is a simplified implementation for illustration
+
+            # Look for any job-like data in the initial HTML
+            job_sections = _JOB_SECTION(tree)
+
+            for section in job_sections[:5]:  # Limit to avoid too many results
+                try:
+                    job = self._standardize_job(
+                        title=_TITLE(section),
+                        company=_COMPANY(section),
+                        location=_LOCATION(section),
+                        url=url,  # Direct link not easily available
+                        description="See Google Jobs listing for details",
+                    )
+
+                    if job.title:
+                        jobs.append(job)
+                except Exception as e:
+                    self.logger.error(f"Error parsing Google job section: {e}")
+
+        except Exception as e:
+            self.logger.error(f"Error in Google job search: {e}")
+
+        return jobs
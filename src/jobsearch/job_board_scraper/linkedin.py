@@ -1,90 +1,226 @@
-from bs4 import BeautifulSoup
-import requests
-import time
-from typing import List, Dict, Any, Optional
-from jobsearch.job_board_scraper.base import JobScraper
+from bs4 import SoupStrainer
+from lxml import etree
+import soupsieve as sv
+import aiohttp
+import asyncio
+import re
+from itertools import islice
+from typing import List, Dict, Any, AsyncIterator, Optional
+from urllib.parse import urlencode
+from jobsearch.cache import DiskCache
+from jobsearch.urls import canonical_job_url
+from jobsearch.job_board_scraper.base import JobScraper, JobRecord, css_class, field_text
+
+_JOB_CARD = etree.XPath(f"//*[{css_class('job-search-card')}]")
+_TITLE = field_text(f".//*[{css_class('base-search-card__title')}]")
+_COMPANY = field_text(f".//*[{css_class('base-search-card__subtitle')}]")
+_LOCATION = field_text(f".//*[{css_class('job-search-card__location')}]")
+_LINK = etree.XPath(f"string(.//a[{css_class('base-card__full-link')}]/@href)", smart_strings=False)
+
+# Only the description subtree of a job page is parsed. The class attribute
+# is matched as a raw string while straining, hence the regex over its tokens
+_DESCRIPTION_STRAINER = SoupStrainer(
+    "div", class_=re.compile(r"(^|\s)(show-more-less-html__markup|description__text)(\s|$)")
+)
+# Selectors are compiled once rather than re-parsed for every job page
+_DESCRIPTION = sv.compile(".show-more-less-html__markup")
+_DESCRIPTION_FALLBACK = sv.compile(".description__text")
 
 class LinkedInScraper(JobScraper):
     """Scrapes LinkedIn for job postings"""
-    
-    def __init__(self, keywords: List[str], locations: Optional[List[str]] = None):
+
+    # LinkedIn tolerates roughly 8 requests every 10 seconds
+    request_delay = 1.25
+    request_burst = 8
+
+    def __init__(self, keywords: List[str], locations: Optional[List[str]] = None,
+                 cache_path: Optional[str] = ".jobsearch_cache/linkedin_descriptions.db",
+                 cache_ttl: float = 86400):
+        """
+        Initialize the LinkedIn scraper
+
+        Args:
+            keywords: Search keywords
+            locations: Locations to combine with each keyword (default: anywhere)
+            cache_path: SQLite file caching job descriptions by URL (None disables caching)
+            cache_ttl: Seconds before a cached description is fetched again (default: one day)
+        """
         super().__init__(keywords)
         self.locations = locations or []
-    
-    def search(self, limit: int = 10) -> List[Dict[str, Any]]:
-        jobs = []
-        
-        # If no locations provided, perform search with just keywords
-        search_combinations = []
-        if not self.locations:
-            search_combinations = [(keyword, None) for keyword in self.keywords]
-        else:
-            # Create combinations of keywords and locations
-            for keyword in self.keywords:
-                for location in self.locations:
-                    search_combinations.append((keyword, location))
-        
-        for keyword, location in search_combinations:
-            location_text = f" in {location}" if location else ""
-            self.logger.info(f"Searching LinkedIn for: {keyword}{location_text}")
-            
+
+        # Search URLs only depend on the keywords and locations, so build them once.
+        # Without locations, each keyword is searched anywhere
+        self._searches = [
+            (keyword, location, self._search_url(keyword, location))
+            for keyword in self.keywords
+            for location in (self.locations or [None])
+        ]
+
+        self.description_cache = DiskCache(cache_path, ttl=cache_ttl) if cache_path else None
+
+    def search(self, limit: int = 10, fetch_descriptions: bool = True) -> List[Dict[str, Any]]:
+        """
+        Search LinkedIn and return a list of job dictionaries
+
+        Args:
+            limit: Maximum number of unique jobs to return
+            fetch_descriptions: Fetch each job's page for its full description. Without it,
+                descriptions are left empty and can be fetched later for chosen jobs with enrich()
+        """
+        return super().search(limit, fetch_descriptions)
+
+    async def search_async(self, limit: int = 10, fetch_descriptions: bool = True) -> List[JobRecord]:
+        return [job async for page in self.search_stream(limit, fetch_descriptions) for job in page]
+
+    async def search_stream(self, limit: int = 10, fetch_descriptions: bool = True,
+                            page_size: int = 20) -> AsyncIterator[List[JobRecord]]:
+        """
+        Search LinkedIn, yielding pages of job records as soon as their descriptions are fetched,
+        so callers can start on the first jobs while the rest of the descriptions are downloaded
+
+        Args:
+            limit: Maximum number of unique jobs to return
+            fetch_descriptions: Fetch each job's page for its full description
+            page_size: Number of jobs in each page
+        """
+        semaphore = asyncio.BoundedSemaphore(self.max_concurrency)
+
+        async with self._create_session() as session:
+            results = await asyncio.gather(
+                *[self._search_one(session, semaphore, keyword, location, url)
+                  for keyword, location, url in self._searches]
+            )
+
+            # Remove duplicates by URL before paying for description fetches,
+            # keeping the first occurrence of each job
+            jobs_by_url: Dict[str, JobRecord] = {}
+            for result in results:
+                for job in result:
+                    jobs_by_url.setdefault(job.url, job)
+            unique_jobs = list(islice(jobs_by_url.values(), limit))
+            pages = [unique_jobs[i:i + page_size] for i in range(0, len(unique_jobs), page_size)]
+
+            if not fetch_descriptions:
+                for page in pages:
+                    yield page
+                return
+
+            # Every description is requested up front, and each page is handed
+            # over once its own descriptions have arrived
+            fetches = [asyncio.ensure_future(self._fetch_job_descriptions(session, semaphore,
+                                                                          [job.url for job in page]))
+                       for page in pages]
             try:
-                # Build search URL (LinkedIn's public jobs page)
-                search_term = keyword.replace(" ", "%20")
-                url = f"https://www.linkedin.com/jobs/search/?keywords={search_term}"
-                
-                # Add location parameter if provided
-                if location:
-                    location_param = location.replace(" ", "%20")
-                    url += f"&location={location_param}"
-                
-                # Make request
-                headers = {
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-                }
-                response = requests.get(url, headers=headers)
-                
-                if response.status_code != 200:
-                    self.logger.error(f"Failed to fetch LinkedIn jobs: {response.status_code}")
-                    continue
-                
-                # Parse HTML
-                soup = BeautifulSoup(response.text, "html.parser")
-                job_cards = soup.select(".job-search-card")
-                
-                for card in job_cards:
-                    try:
-                        title_elem = card.select_one(".base-search-card__title")
-                        company_elem = card.select_one(".base-search-card__subtitle")
-                        location_elem = card.select_one(".job-search-card__location")
-                        link_elem = card.select_one("a.base-card__full-link")
-                        
-                        job = {
-                            "title": title_elem.text.strip() if title_elem else "",
-                            "company": company_elem.text.strip() if company_elem else "",
-                            "location": location_elem.text.strip() if location_elem else "",
-                            "url": link_elem.get("href") if link_elem else "",
-                            "description": "",  # Need to fetch job page for description
-                        }
-                        
-                        # Only add if we have minimum viable information
-                        if job["title"] and job["url"]:
-                            jobs.append(self._standardize_job(job))
-                    except Exception as e:
-                        self.logger.error(f"Error parsing job card: {e}")
-                
-                # Add delay to avoid rate limiting
-                time.sleep(2)
-                
-            except Exception as e:
-                self.logger.error(f"Error in LinkedIn search: {e}")
-        
-        # Remove duplicates by URL
-        unique_jobs = []
-        seen_urls = set()
-        for job in jobs:
-            if job["url"] not in seen_urls:
-                seen_urls.add(job["url"])
-                unique_jobs.append(job)
-        
-        return unique_jobs[:limit]
\ No newline at end of file
+                for page, fetch in zip(pages, fetches):
+                    for job, description in zip(page, await fetch):
+                        job.description = description
+                    yield page
+            finally:
+                # Fetches still running when the caller stops listening are abandoned
+                for fetch in fetches:
+                    fetch.cancel()
+                await asyncio.gather(*fetches, return_exceptions=True)
+
+    def enrich(self, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Fill in the descriptions of jobs returned by search(fetch_descriptions=False)
+
+        Args:
+            jobs: Job dictionaries to update in place
+
+        Returns:
+            The same job dictionaries
+        """
+        return asyncio.run(self.enrich_async(jobs))
+
+    async def enrich_async(self, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Asynchronously fill in job descriptions, keeping the current one of any job whose page fails"""
+        semaphore = asyncio.BoundedSemaphore(self.max_concurrency)
+        async with self._create_session() as session:
+            descriptions = await self._fetch_job_descriptions(session, semaphore, [job["url"] for job in jobs])
+
+        for job, description in zip(jobs, descriptions):
+            if description:
+                job["description"] = description
+        return jobs
+
+    async def _search_one(self, session: aiohttp.ClientSession,
+                          semaphore: asyncio.BoundedSemaphore,
+                          keyword: str,
+                          location: Optional[str],
+                          url: str) -> List[JobRecord]:
+        jobs = []
+        location_text = f" in {location}" if location else ""
+        self.logger.info(f"Searching LinkedIn for: {keyword}{location_text}")
+
+        try:
+            tree = await self._fetch_tree(session, semaphore, url)
+            if tree is None:
+                return jobs
+
+            job_cards = _JOB_CARD(tree)
+
+            for card in job_cards:
+                try:
+                    job = self._standardize_job(
+                        title=_TITLE(card),
+                        company=_COMPANY(card),
+                        location=_LOCATION(card),
+                        url=canonical_job_url(_LINK(card)),
+                        description="",  # Fetched from the job page once deduplicated
+                    )
+
+                    # Only add if we have minimum viable information
+                    if job.title and job.url:
+                        jobs.append(job)
+                except Exception as e:
+                    self.logger.error(f"Error parsing job card: {e}")
+
+        except Exception as e:
+            self.logger.error(f"Error in LinkedIn search: {e}")
+
+        return jobs
+
+    @staticmethod
+    def _search_url(keyword: str, location: Optional[str]) -> str:
+        """Build the URL of LinkedIn's public jobs search page"""
+        params = {"keywords": keyword}
+        # Add location parameter if provided
+        if location:
+            params["location"] = location
+        return f"https://www.linkedin.com/jobs/search/?{urlencode(params)}"
+
+    async def _fetch_job_descriptions(self, session: aiohttp.ClientSession,
+                                      semaphore: asyncio.BoundedSemaphore,
+                                      job_urls: List[str]) -> List[str]:
+        """Fetch the full descriptions of several LinkedIn jobs concurrently"""
+        return await asyncio.gather(
+            *[self._fetch_job_description(session, semaphore, job_url) for job_url in job_urls]
+        )
+
+    async def _fetch_job_description(self, session: aiohttp.ClientSession,
+                                     semaphore: asyncio.BoundedSemaphore,
+                                     job_url: str) -> str:
+        """Fetch the full description from a LinkedIn job page"""
+        # Jobs from search() already have canonical URLs, but enrich() may be given raw ones
+        cache_key = canonical_job_url(job_url)
+        if self.description_cache is not None:
+            cached = self.description_cache.get(cache_key)
+            if cached is not None:
+                return cached["description"]
+
+        try:
+            soup = await self._fetch_soup(session, semaphore, job_url, parse_only=_DESCRIPTION_STRAINER)
+            if soup is None:
+                return ""
+
+            desc_elem = _DESCRIPTION.select_one(soup) or _DESCRIPTION_FALLBACK.select_one(soup)
+            description = self._txt(desc_elem)
+
+            if description and self.description_cache is not None:
+                self.description_cache.set(cache_key, {"description": description})
+            return description
+
+        except Exception as e:
+            self.logger.error(f"Error fetching LinkedIn job description: {e}")
+            return ""
@@ -5,9 +5,11 @@ Job matcher module for evaluating job listings against candidate profiles
 from jobsearch.job_matcher.base import BaseJobMatcher
 from jobsearch.job_matcher.claude_matcher import ClaudeJobMatcher
 from jobsearch.job_matcher.groq_matcher import GroqJobMatcher
+from jobsearch.job_matcher.embedding_prefilter import EmbeddingPrefilter
 
 __all__ = [
     'BaseJobMatcher',
     'ClaudeJobMatcher',
-    'GroqJobMatcher'
+    'GroqJobMatcher',
+    'EmbeddingPrefilter'
 ]
@@ -1,111 +1,468 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncContextManager, AsyncIterable, AsyncIterator, Iterable, Optional, Set
 from abc import ABC, abstractmethod
+from itertools import islice
+import asyncio
+import hashlib
 import logging
-import json
+import orjson
+import re
+from jobsearch.cache import DiskCache
+from jobsearch.urls import canonical_job_url
+from jobsearch.job_matcher.embedding_prefilter import EmbeddingPrefilter
+
+# Compiled once, as every LLM reply is searched for its JSON payload
+_JSON_FENCE = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL)
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
+# Instructions following the candidate in every prompt, before the jobs to evaluate
+_JOB_INSTRUCTIONS = """
+        ### Analysis Instructions:
+        1. Evaluate how well the job below matches the candidate's experience and skills (scale 1-10)
+        2. Evaluate how well the job below matches the candidate's interests (scale 1-10)
+        3. Determine whether the candidate would likely receive a first-round interview based on qualifications
+        4. Provide 2-3 key reasons why the job is a good match or not
+        
+        ### Output Format:
+        Return a JSON with the following structure:
+        ```json
+        {
+            "experience_match_score": 0-10,
+            "interest_match_score": 0-10,
+            "interview_probability": 0-10,
+            "overall_score": 0-10,
+            "match_reasons": ["reason1", "reason2"],
+            "summary": "One sentence summary of fit"
+        }
+        ```
+        """
+_BATCH_INSTRUCTIONS = """
+        ### Analysis Instructions:
+        For each job below:
+        1. Evaluate how well this job matches the candidate's experience and skills (scale 1-10)
+        2. Evaluate how well this job matches the candidate's interests (scale 1-10)
+        3. Determine whether the candidate would likely receive a first-round interview based on qualifications
+        4. Provide 2-3 key reasons why this job is a good match or not
+        
+        ### Output Format:
+        Return a JSON with one result per job, in the following structure:
+        ```json
+        {
+            "results": [
+                {
+                    "job_index": 1,
+                    "experience_match_score": 0-10,
+                    "interest_match_score": 0-10,
+                    "interview_probability": 0-10,
+                    "overall_score": 0-10,
+                    "match_reasons": ["reason1", "reason2"],
+                    "summary": "One sentence summary of fit"
+                }
+            ]
+        }
+        ```
+        """
 
 class BaseJobMatcher(ABC):
     """Base class for job matcher implementations that use different LLM backends"""
+
+    # Maximum number of concurrent requests to the LLM API
+    max_concurrency = 20
+    # Number of jobs evaluated together in a single LLM request
+    batch_size = 8
+    # Output tokens allowed for the analysis of one job, and for any one request. An analysis is
+    # around 150 tokens of JSON, so this bounds runaway replies, and how long the slowest one takes,
+    # without truncating it
+    max_tokens = 320
+    max_output_tokens = 4096
+    # Number of description characters included in prompts
+    max_description_length = 1000
+    # Number of times a failed LLM request is retried
+    max_retries = 3
     
     def __init__(self, candidate_profile: Dict[str, Any], 
-                 candidate_interests: List[str]):
+                 candidate_interests: List[str],
+                 prefilter: Optional[EmbeddingPrefilter] = None,
+                 cache_path: Optional[str] = ".jobsearch_cache/job_analyses.db",
+                 cache_ttl: Optional[float] = None,
+                 top_k: Optional[int] = None):
         self.candidate_profile = candidate_profile
         self.candidate_interests = candidate_interests
+        self.prefilter = prefilter
+        self.top_k = top_k
+        self.analysis_cache = DiskCache(cache_path, ttl=cache_ttl) if cache_path else None
         self.logger = logging.getLogger(self.__class__.__name__)
+
+        # The candidate part of every prompt is identical, so it is serialized once.
+        # Keeping it byte-for-byte stable also lets LLM APIs reuse their cached prefill of it.
+        # Compact JSON reads just as well to the LLM and costs fewer input tokens than indented JSON
+        self._profile_json = orjson.dumps(candidate_profile).decode()
+        self._interests_json = orjson.dumps(candidate_interests).decode()
+        self._prompt_prefix = f"""
+        ## Task: Evaluate job fit for candidate
+        
+        ### Candidate Profile:
+        ```json
+        {self._profile_json}
+        ```
+        
+        ### Candidate Interests:
+        ```json
+        {self._interests_json}
+        ```
+        """
+        # Analyses are only reused for the same candidate, so every cache key starts from this
+        self._candidate_hash = hashlib.sha256(self._prompt_prefix.encode())
+        # The instructions are the same for every job too, so they come before the job text.
+        # Only the jobs then differ between requests, and the rest can be served from
+        # the LLM API's prompt cache, which only covers identical leading tokens
+        self._job_prompt_prefix = self._prompt_prefix + _JOB_INSTRUCTIONS
+        self._batch_prompt_prefix = self._prompt_prefix + _BATCH_INSTRUCTIONS
     
     def process_jobs(self, raw_jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Process raw job listings and return matches"""
-        
-        # Check potential matches based on keywords and basic criteria
-        potential_matches = self._filter_basic_criteria(raw_jobs)
+        potential_matches = self._potential_matches(raw_jobs)
         
         # Use AI to rank jobs based on fit with candidate profile
         ranked_jobs = self._rank_jobs_with_ai(potential_matches)
         
         # Return top matches
         return ranked_jobs
+
+    async def stream_jobs(self, raw_jobs: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process raw job listings, yielding each match as soon as its AI analysis is ready
+        so that callers can start on the first results while the rest are analyzed.
+        Matches are yielded in completion order rather than ranked
+        """
+        raw_jobs = await self._enrich_job_details_async(raw_jobs)
+        async for job in self._analyze_jobs(self._potential_matches(raw_jobs)):
+            yield job
+
+    async def stream_job_pages(self, pages: AsyncIterable[List[Dict[str, Any]]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process pages of raw job listings as they arrive, yielding each match as soon as
+        its AI analysis is ready. Deduplication holds across pages, and the number of jobs
+        analyzed stays within top_k and the prefilter's top_k over all pages together.
+        As later pages aren't known yet, the budget goes to the best matches of the earliest pages
+        """
+        seen = set()
+        budgets = [self.top_k, self.prefilter.top_k if self.prefilter is not None else None]
+        budget = min((limit for limit in budgets if limit is not None), default=None)
+
+        async for raw_jobs in pages:
+            # Pages keep being consumed once the budget is spent, so their producer isn't blocked
+            if budget == 0:
+                continue
+
+            raw_jobs = await self._enrich_job_details_async(raw_jobs)
+            jobs = self._top_matches(self._filter_basic_criteria(self._deduplicate(raw_jobs, seen)))
+            if budget is not None:
+                if len(jobs) > budget:
+                    jobs = sorted(jobs, key=lambda job: job.get("initial_match_score", 0), reverse=True)[:budget]
+                budget -= len(jobs)
+
+            async for job in self._analyze_jobs(jobs):
+                yield job
+
+    async def _enrich_job_details_async(self, raw_jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fill in missing job details before filtering, for backends that can fetch them"""
+        return raw_jobs
+
+    def _potential_matches(self, raw_jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Select the raw job listings worth an AI analysis"""
+
+        # Cross-posted jobs would otherwise each pay for their own AI analysis
+        unique_jobs = self._deduplicate(raw_jobs)
+        
+        # Check potential matches based on keywords and basic criteria
+        potential_matches = self._filter_basic_criteria(unique_jobs)
+
+        # Only the most promising matches are worth an AI analysis
+        return self._top_matches(potential_matches)
     
-    def _filter_basic_criteria(self, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _deduplicate(self, jobs: List[Dict[str, Any]], seen: Optional[Set[Any]] = None) -> List[Dict[str, Any]]:
         """
-        TODO: basic filtering before resorting to AI
+        Drop repeated postings of the same job, keeping the first
+
+        Args:
+            jobs: Job dictionaries to deduplicate
+            seen: Keys of jobs kept earlier, updated with the ones kept now (default: a new set)
         """
+        if seen is None:
+            seen = set()
+        unique_jobs = []
+        for job in jobs:
+            # Descriptions are compared by a short digest rather than kept whole in the set.
+            # Only the part included in prompts is compared, as postings that agree on it would
+            # get the same analysis even if one has an extra footer, such as a different apply link
+            description = job.get("description", "")[:self.max_description_length]
+            key = (
+                job["company"].strip().lower(),
+                job["title"].strip().lower(),
+                hashlib.blake2b(description.encode(), digest_size=8).digest()
+            )
+            if key not in seen:
+                seen.add(key)
+                unique_jobs.append(job)
+        return unique_jobs
+    
+    def _filter_basic_criteria(self, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Drop jobs unrelated to the candidate with the embedding prefilter, if there is one"""
+        # Filtered before paying for their LLM analysis
+        if self.prefilter is not None:
+            return self.prefilter.filter(f"{self._profile_json}\n{self._interests_json}", jobs)
         return jobs
     
-    @abstractmethod
+    def _top_matches(self, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Keep the top_k jobs with the highest initial match score"""
+        if self.top_k is None or len(jobs) <= self.top_k:
+            return jobs
+        # Without scores from the basic criteria, any cut would just drop the last jobs
+        if not any("initial_match_score" in job for job in jobs):
+            return jobs
+        return sorted(jobs, key=lambda job: job.get("initial_match_score", 0), reverse=True)[:self.top_k]
+    
     def _rank_jobs_with_ai(self, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Use AI to analyze and rank jobs based on candidate fit"""
+        if not jobs:
+            return []
+
+        try:
+            return asyncio.run(self._rank_jobs_with_ai_async(jobs))
+        except Exception as e:
+            self.logger.error(f"Error in ranking process: {e}")
+            # Return original jobs if ranking fails
+            return jobs
+
+    async def _rank_jobs_with_ai_async(self, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Analyze all jobs concurrently, then rank them by overall score"""
+        async for _ in self._analyze_jobs(jobs):
+            pass
+
+        # Sort by overall score (descending)
+        return sorted(jobs, key=lambda x: x.get("overall_score", 0), reverse=True)
+
+    async def _analyze_jobs(self, jobs: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """Analyze jobs concurrently, yielding each one as soon as its AI analysis is added"""
+        # Descriptions are truncated once per job, rather than for each prompt and cache key using them
+        for job in jobs:
+            job["_desc_trunc"] = (job.get("description") or "No description provided")[:self.max_description_length]
+
+        try:
+            semaphore = asyncio.BoundedSemaphore(self.max_concurrency)
+
+            # Jobs already analyzed for this candidate and model don't need another request
+            uncached_jobs = []
+            for job in jobs:
+                cached = self.analysis_cache.get(self._analysis_key(job)) if self.analysis_cache is not None else None
+                # Entries that aren't an analysis object, written by older versions, are analyzed again
+                if isinstance(cached, dict):
+                    job.update(cached)
+                    job.pop("_desc_trunc", None)
+                    yield job
+                else:
+                    uncached_jobs.append(job)
+
+            # A client is only created when some jobs still need a request
+            if not uncached_jobs:
+                return
+
+            # Evaluate several jobs per request, so the candidate profile is only sent once per batch.
+            # Batching jobs of similar description length keeps their requests evenly sized, so no
+            # batch is held up by one long description. As the semaphore admits requests in the order
+            # they wait on it, the shortest batches are also sent first and their results arrive early
+            uncached_jobs.sort(key=lambda job: len(job["_desc_trunc"]))
+            job_iter = iter(uncached_jobs)
+            batches = iter(lambda: list(islice(job_iter, self.batch_size)), [])
+
+            async with self._create_client() as client:
+                async for batch in self._analyze_batches(client, semaphore, batches):
+                    for job in batch:
+                        job.pop("_desc_trunc", None)
+                        yield job
+        finally:
+            for job in jobs:
+                job.pop("_desc_trunc", None)
+
+    async def _analyze_batches(self, client: Any, semaphore: asyncio.BoundedSemaphore,
+                               batches: Iterable[List[Dict[str, Any]]]) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Analyze batches of jobs concurrently, yielding each batch as soon as it is analyzed"""
+        tasks = [asyncio.ensure_future(self._analyze_batch(client, semaphore, batch)) for batch in batches]
+        try:
+            for next_batch in asyncio.as_completed(tasks):
+                yield await next_batch
+        finally:
+            # Requests still running when the caller stops listening are abandoned
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _analyze_batch(self, client: Any, semaphore: asyncio.BoundedSemaphore,
+                             jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Add the AI analysis of each job in a batch to it, returning the batch. Jobs missing
+        from the reply, or all of them if it can't be parsed, are analyzed one at a time instead
         """
-        Use AI to analyze and rank jobs based on candidate fit.
+        if len(jobs) == 1:
+            await self._analyze_job(client, semaphore, jobs[0])
+            return jobs
+
+        ai_text = None
+        try:
+            prompt = self._prepare_batch_analysis_prompt(jobs)
+            async with semaphore:
+                ai_text = await self._complete(client, prompt, self._max_tokens_for(len(jobs)))
+        except Exception as e:
+            self.logger.warning(f"Falling back to single job analysis after batch error: {e}")
+
+        retry = self._merge_batch_analysis(jobs, ai_text)
+        await asyncio.gather(*[self._analyze_job(client, semaphore, job) for job in retry])
+        return jobs
+
+    def _merge_batch_analysis(self, jobs: List[Dict[str, Any]],
+                              ai_text: Optional[str]) -> List[Dict[str, Any]]:
+        """Add the analyses in a batch reply to their jobs, returning the jobs the reply is missing"""
+        results = {}
+        if ai_text is not None:
+            try:
+                for result in self._parse_llm_json(ai_text)["results"]:
+                    results[int(result.pop("job_index"))] = result
+            except Exception as e:
+                self.logger.warning(f"Falling back to single job analysis after batch error: {e}")
+
+        retry = []
+        for index, job in enumerate(jobs, start=1):
+            if index in results:
+                job.update(results[index])
+                self._cache_analysis(job, results[index])
+            else:
+                retry.append(job)
+        return retry
+
+    async def _analyze_job(self, client: Any, semaphore: asyncio.BoundedSemaphore,
+                           job: Dict[str, Any]) -> None:
+        """Add the AI analysis of a job to it, or a note about the error if it failed"""
+        try:
+            prompt = self._prepare_analysis_prompt(job)
+            async with semaphore:
+                ai_text = await self._complete(client, prompt, self._max_tokens_for(1))
+
+            try:
+                ai_analysis = self._parse_llm_json(ai_text)
+            except orjson.JSONDecodeError:
+                ai_analysis = None
+
+            # Only an object is a usable analysis. Anything else gets a placeholder result,
+            # which isn't worth caching
+            if isinstance(ai_analysis, dict):
+                self._cache_analysis(job, ai_analysis)
+            else:
+                ai_analysis = self._extract_json_from_llm_response(ai_text)
+                job["ai_analysis_error"] = "Failed to parse AI response"
+
+            # Add AI analysis to job
+            job.update(ai_analysis)
+
+        except Exception as e:
+            self.logger.error(f"Error analyzing job: {e}")
+            # Still include the job with a note about the error
+            job["ai_analysis_error"] = str(e)
+
+    def _analysis_key(self, job: Dict[str, Any]) -> str:
+        """Return the analysis cache key of a job, for the current candidate and model"""
+        key = self._candidate_hash.copy()
+        # Keyed on the canonical URL, so reposts with new tracking parameters still hit the cache
+        for value in (getattr(self, "model", ""), canonical_job_url(job.get("url") or ""), job["title"],
+                      job["company"], job["_desc_trunc"]):
+            key.update(b"\0" + str(value).encode())
+        return key.hexdigest()
+
+    def _cache_analysis(self, job: Dict[str, Any], ai_analysis: Dict[str, Any]) -> None:
+        """Store the AI analysis of a job so later runs can reuse it"""
+        if self.analysis_cache is not None:
+            self.analysis_cache.set(self._analysis_key(job), ai_analysis)
+
+    @abstractmethod
+    def _create_client(self) -> AsyncContextManager[Any]:
+        """
+        Create the asynchronous API client shared by all requests of a ranking run, so that
+        they reuse its kept-alive connections. SDK clients that retry rate limits and server
+        errors themselves are given max_retries.
+        This method must be implemented by specific LLM client subclasses.
+        """
+        pass
+
+    def _max_tokens_for(self, num_jobs: int) -> int:
+        """Return the output token limit for a request analyzing num_jobs jobs"""
+        return min(self.max_tokens * num_jobs, self.max_output_tokens)
+
+    @abstractmethod
+    async def _complete(self, client: Any, prompt: str, max_tokens: int) -> str:
+        """
+        Send an analysis prompt to the LLM and return the text of its reply.
         This method must be implemented by specific LLM client subclasses.
         """
         pass
     
     def _prepare_analysis_prompt(self, job: Dict[str, Any]) -> str:
         """Prepare the prompt for AI analysis"""
-        profile_json = json.dumps(self.candidate_profile, indent=2)
-        interests_json = json.dumps(self.candidate_interests, indent=2)
-        
-        prompt = f"""
-        ## Task: Evaluate job fit for candidate
-        
-        ### Candidate Profile:
-        ```json
-        {profile_json}
-        ```
-        
-        ### Candidate Interests:
-        ```json
-        {interests_json}
-        ```
-        
+        return self._job_prompt_prefix + self._job_prompt(job)
+
+    def _job_prompt(self, job: Dict[str, Any]) -> str:
+        """Prepare the job specific part of the prompt for AI analysis"""
+        return f"""
         ### Job Information:
         - Title: {job['title']}
         - Company: {job['company']}
-        - Description: {job.get('description', 'No description provided')[:1000]}...
-        
-        ### Analysis Instructions:
-        1. Evaluate how well this job matches the candidate's experience and skills (scale 1-10)
-        2. Evaluate how well this job matches the candidate's interests (scale 1-10)
-        3. Determine whether the candidate would likely receive a first-round interview based on qualifications
-        4. Provide 2-3 key reasons why this job is a good match or not
-        
-        ### Output Format:
-        Return a JSON with the following structure:
-        ```json
-        {{
-            "experience_match_score": 0-10,
-            "interest_match_score": 0-10,
-            "interview_probability": 0-10,
-            "overall_score": 0-10,
-            "match_reasons": ["reason1", "reason2"],
-            "summary": "One sentence summary of fit"
-        }}
-        ```
+        - Description: {job['_desc_trunc']}...
         """
-        return prompt
-    
+
+    def _prepare_batch_analysis_prompt(self, jobs: List[Dict[str, Any]]) -> str:
+        """Prepare the prompt for AI analysis of several jobs in one request"""
+        return self._batch_prompt_prefix + self._batch_prompt(jobs)
+
+    def _batch_prompt(self, jobs: List[Dict[str, Any]]) -> str:
+        """Prepare the part of the prompt listing a batch of jobs for AI analysis"""
+        jobs_text = "".join(
+            f"""
+        ### Job {index}:
+        - Title: {job['title']}
+        - Company: {job['company']}
+        - Description: {job['_desc_trunc']}...
+        """
+            for index, job in enumerate(jobs, start=1)
+        )
+
+        return f"""
+        ### Jobs ({len(jobs)} to evaluate):
+        {jobs_text}"""
+
     def _extract_json_from_llm_response(self, ai_text: str) -> Dict[str, Any]:
         """Extract JSON from LLM response text"""
-        ai_json_str = ai_text.strip()
-        
-        # Extract JSON if it's wrapped in backticks
-        if "```json" in ai_json_str:
-            start = ai_json_str.find("```json") + 7
-            end = ai_json_str.find("```", start)
-            ai_json_str = ai_json_str[start:end].strip()
-        elif "```" in ai_json_str:
-            start = ai_json_str.find("```") + 3
-            end = ai_json_str.find("```", start)
-            ai_json_str = ai_json_str[start:end].strip()
-        
         # Handle potential issues with JSON parsing
         try:
-            return json.loads(ai_json_str)
-        except json.JSONDecodeError:
-            self.logger.error(f"Failed to parse JSON: {ai_json_str}")
-            return {
-                "experience_match_score": 0,
-                "interest_match_score": 0,
-                "interview_probability": 0,
-                "overall_score": 0,
-                "match_reasons": ["Error parsing AI response"],
-                "summary": "Error in analysis"
-            } 
\ No newline at end of file
+            ai_json = self._parse_llm_json(ai_text)
+        except orjson.JSONDecodeError as e:
+            self.logger.error(f"Failed to parse JSON: {e.doc}")
+        else:
+            if isinstance(ai_json, dict):
+                return ai_json
+            self.logger.error(f"Expected a JSON object, got: {ai_text}")
+        return {
+            "experience_match_score": 0,
+            "interest_match_score": 0,
+            "interview_probability": 0,
+            "overall_score": 0,
+            "match_reasons": ["Error parsing AI response"],
+            "summary": "Error in analysis"
+        }
+
+    @staticmethod
+    def _parse_llm_json(ai_text: str) -> Any:
+        """Parse the JSON in LLM response text, raising orjson.JSONDecodeError if it is invalid"""
+        # Take the JSON object inside a code fence if there is one, otherwise the
+        # outermost braces, which also covers replies cut off before a closing fence
+        match = _JSON_FENCE.search(ai_text) or _JSON_OBJECT.search(ai_text)
+        ai_json_str = match.group(match.lastindex or 0) if match else ai_text.strip()
+        
+        return orjson.loads(ai_json_str)
@@ -1,15 +1,29 @@
-from typing import List, Dict, Any
-import requests
-import json
+from typing import List, Dict, Any, Optional
+import asyncio
+import httpx
+import orjson
 from jobsearch.job_matcher.base import BaseJobMatcher
+from jobsearch.job_matcher.embedding_prefilter import EmbeddingPrefilter
 
 class ClaudeJobMatcher(BaseJobMatcher):
     """Job matcher implementation using Anthropic's Claude API"""
+
+    # Rate limits, server errors and overloads are retried with exponential backoff
+    retry_backoff = 0.5
+    retry_statuses = frozenset({429, 500, 502, 503, 504, 529})
+    # Claude only caches prompt prefixes of at least this many tokens, and ignores
+    # the cache breakpoint of shorter ones. Haiku models need twice as many
+    min_cacheable_tokens = 1024
+    min_cacheable_tokens_haiku = 2048
     
     def __init__(self, candidate_profile: Dict[str, Any],
                  candidate_interests: List[str],
                  api_key: str,
-                 model: str = "claude-3-haiku-20240307"):
+                 model: str = "claude-3-haiku-20240307",
+                 prefilter: Optional[EmbeddingPrefilter] = None,
+                 cache_path: Optional[str] = ".jobsearch_cache/job_analyses.db",
+                 cache_ttl: Optional[float] = None,
+                 top_k: Optional[int] = None):
         """
         Initialize the Claude job matcher
         
@@ -18,73 +32,100 @@ class ClaudeJobMatcher(BaseJobMatcher):
             candidate_interests: List of candidate interests as strings
             api_key: Anthropic API key
             model: Claude model to use (default: claude-3-haiku-20240307)
+            prefilter: Embedding prefilter dropping unrelated jobs before AI analysis (default: none)
+            cache_path: SQLite file caching job analyses (None disables caching)
+            cache_ttl: Seconds before a cached analysis is requested again (default: never)
+            top_k: Maximum number of jobs sent for AI analysis, keeping those with the highest
+                initial match score (default: None, sending every job passing the basic criteria)
         """
-        super().__init__(candidate_profile, candidate_interests)
+        super().__init__(candidate_profile, candidate_interests, prefilter, cache_path, cache_ttl, top_k)
         self.api_key = api_key
         self.model = model
         self.api_url = "https://api.anthropic.com/v1/messages"
+
+        # At roughly four characters per token, say when the prefix is too short to be cached,
+        # which is usual for small profiles on Haiku, rather than silently paying for every prefill
+        min_tokens = self.min_cacheable_tokens_haiku if "haiku" in model else self.min_cacheable_tokens
+        if len(self._batch_prompt_prefix) // 4 < min_tokens:
+            self.logger.info(f"Prompt prefix is likely under the {min_tokens} tokens {model} needs "
+                             "to cache it, so every request pays for its prefill")
     
-    def _rank_jobs_with_ai(self, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Use Claude to analyze and rank jobs based on candidate fit"""
-        if not jobs:
-            return []
-            
-        try:
-            ranked_jobs = []
-            
-            for job in jobs:
-                try:
-                    # Prepare prompt for Claude
-                    prompt = self._prepare_analysis_prompt(job)
-                    
-                    # Call Claude API
-                    headers = {
-                        "Content-Type": "application/json",
-                        "x-api-key": self.api_key,
-                        "anthropic-version": "2023-06-01"
-                    }
-                    
-                    payload = {
-                        "model": self.model,
-                        "max_tokens": 1000,
-                        "messages": [
-                            {
-                                "role": "user",
-                                "content": prompt
-                            }
-                        ],
-                        "system": "You are a job matching assistant specialized in evaluating job fit for candidates."
+    def _create_client(self) -> httpx.AsyncClient:
+        """Create an HTTP client for the Claude API"""
+        headers = {
+            "Content-Type": "application/json",
+            "x-api-key": self.api_key,
+            "anthropic-version": "2023-06-01"
+        }
+        # Connections are pooled and kept alive for the whole ranking run, one per concurrent request.
+        # The transport retries failed connection attempts
+        transport = httpx.AsyncHTTPTransport(
+            retries=self.max_retries,
+            limits=httpx.Limits(max_connections=self.max_concurrency,
+                                max_keepalive_connections=self.max_concurrency)
+        )
+        return httpx.AsyncClient(headers=headers, timeout=60, transport=transport)
+
+    async def _complete(self, client: httpx.AsyncClient, prompt: str, max_tokens: int) -> str:
+        """Send a prompt to Claude and return the text of its reply"""
+        payload = {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": self._content_blocks(prompt)
+                },
+                # Claude continues from the opening fence, and generation ends as soon as it closes
+                # it, so the reply is just the JSON without any text around it
+                {
+                    "role": "assistant",
+                    "content": "```json"
+                }
+            ],
+            "system": "You are a job matching assistant specialized in evaluating job fit for candidates.",
+            "temperature": 0,
+            "stop_sequences": ["\n```"]
+        }
+        
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1))
+            response = await client.post(self.api_url, json=payload)
+            if response.status_code not in self.retry_statuses or attempt == self.max_retries:
+                break
+            self.logger.warning(f"Retrying Claude API request: {response.status_code}")
+        
+        if response.status_code != 200:
+            raise Exception(f"Claude API error: {response.status_code} {response.text}")
+        
+        # Parse Claude response
+        response_data = orjson.loads(response.content)
+        usage = response_data.get("usage", {})
+        self.logger.debug(f"Claude prompt cache read {usage.get('cache_read_input_tokens', 0)} tokens, "
+                          f"wrote {usage.get('cache_creation_input_tokens', 0)} tokens")
+        return response_data.get("content", [{}])[0].get("text", "")
+
+    def _content_blocks(self, prompt: str) -> List[Dict[str, Any]]:
+        """
+        Split a prompt into content blocks, marking the candidate and instructions prefix shared
+        by every prompt of its kind as cacheable so that later requests skip its prefill.
+        The system prompt is covered by the same cache entry, as it comes before the prefix
+        """
+        # The instructions are part of the prefix to get closer to the minimum cacheable length,
+        # which the candidate profile alone rarely reaches. Shorter prefixes are simply not cached
+        for prefix in (self._job_prompt_prefix, self._batch_prompt_prefix):
+            if prompt.startswith(prefix):
+                return [
+                    {
+                        "type": "text",
+                        "text": prefix,
+                        "cache_control": {"type": "ephemeral"}
+                    },
+                    {
+                        "type": "text",
+                        "text": prompt[len(prefix):]
                     }
-                    
-                    response = requests.post(
-                        self.api_url,
-                        headers=headers,
-                        json=payload
-                    )
-                    
-                    if response.status_code != 200:
-                        raise Exception(f"Claude API error: {response.status_code} {response.text}")
-                    
-                    # Parse Claude response
-                    response_data = response.json()
-                    ai_text = response_data.get("content", [{}])[0].get("text", "")
-                    ai_analysis = self._extract_json_from_llm_response(ai_text)
-                    
-                    # Add AI analysis to job
-                    job.update(ai_analysis)
-                    ranked_jobs.append(job)
-                    
-                except Exception as e:
-                    self.logger.error(f"Error analyzing job with Claude: {e}")
-                    # Still include the job with a note about the error
-                    job["ai_analysis_error"] = str(e)
-                    ranked_jobs.append(job)
-            
-            # Sort by overall score (descending)
-            ranked_jobs.sort(key=lambda x: x.get("overall_score", 0), reverse=True)
-            return ranked_jobs
-            
-        except Exception as e:
-            self.logger.error(f"Error in Claude ranking process: {e}")
-            # Return original jobs if Claude ranking fails
-            return jobs 
\ No newline at end of file
+                ]
+
+        return [{"type": "text", "text": prompt}]
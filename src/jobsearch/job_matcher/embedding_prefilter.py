@@ -0,0 +1,101 @@
+from typing import List, Dict, Any, Optional
+import hashlib
+import logging
+from jobsearch.cache import DiskCache
+
+class EmbeddingPrefilter:
+    """
+    Drops jobs that are semantically far from the candidate before they are sent to an LLM.
+    Jobs and the candidate are embedded with a local sentence-transformers model,
+    and jobs are kept by the cosine similarity of their embedding to the candidate's.
+    Requires the optional sentence-transformers package.
+    """
+
+    # Number of job text characters embedded. Models only read their first few hundred
+    # tokens, so tokenizing the rest of a long description would be wasted work
+    max_text_length = 2000
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2",
+                 top_k: Optional[int] = 50,
+                 min_score: float = 0.35,
+                 batch_size: int = 64,
+                 cache_path: Optional[str] = ".jobsearch_cache/job_embeddings.db"):
+        """
+        Initialize the embedding prefilter
+
+        Args:
+            model_name: sentence-transformers model used to embed text (default: all-MiniLM-L6-v2)
+            top_k: Maximum number of jobs to keep (None keeps every job above min_score)
+            min_score: Minimum cosine similarity for a job to be kept
+            batch_size: Number of texts embedded together
+            cache_path: SQLite file caching job embeddings by text (None disables caching)
+        """
+        self.model_name = model_name
+        self.top_k = top_k
+        self.min_score = min_score
+        self.batch_size = batch_size
+        self.embedding_cache = DiskCache(cache_path) if cache_path else None
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._model = None
+        self._candidate_embeddings: Dict[str, Any] = {}
+
+    @property
+    def model(self):
+        """The sentence-transformers model, loaded on first use"""
+        if self._model is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError as e:
+                raise ImportError("EmbeddingPrefilter requires the sentence-transformers package") from e
+            self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def filter(self, candidate_text: str, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Keep the jobs most similar to the candidate, in their original order
+
+        Args:
+            candidate_text: Text describing the candidate's profile and interests
+            jobs: Job dictionaries to filter
+        """
+        if not jobs:
+            return []
+        import numpy as np
+
+        # The candidate is embedded once, however many times the filter runs
+        candidate_embedding = self._candidate_embeddings.get(candidate_text)
+        if candidate_embedding is None:
+            candidate_embedding = self.model.encode(candidate_text, normalize_embeddings=True)
+            self._candidate_embeddings[candidate_text] = candidate_embedding
+
+        # Embeddings are normalized, so their dot product is the cosine similarity
+        job_embeddings = self._embed([f"{job['title']}\n{job.get('description', '')}"[:self.max_text_length]
+                                      for job in jobs])
+        scores = job_embeddings @ candidate_embedding
+
+        keep = np.flatnonzero(scores >= self.min_score)
+        if self.top_k is not None and len(keep) > self.top_k:
+            keep = keep[np.argsort(scores[keep])[::-1][:self.top_k]]
+
+        self.logger.info(f"Embedding prefilter kept {len(keep)} of {len(jobs)} jobs")
+        return [jobs[i] for i in sorted(keep)]
+
+    def _embed(self, texts: List[str]) -> Any:
+        """Embed texts in batches, reusing cached embeddings"""
+        import numpy as np
+
+        keys = [hashlib.sha256(f"{self.model_name}\n{text}".encode()).hexdigest() for text in texts]
+        cached = [self.embedding_cache.get(key) if self.embedding_cache is not None else None
+                  for key in keys]
+
+        # Only texts without a cached embedding are sent to the model, in one call
+        missing = [i for i, embedding in enumerate(cached) if embedding is None]
+        if missing:
+            embeddings = self.model.encode([texts[i] for i in missing], batch_size=self.batch_size,
+                                           normalize_embeddings=True)
+            for i, embedding in zip(missing, embeddings):
+                cached[i] = embedding
+                if self.embedding_cache is not None:
+                    self.embedding_cache.set(keys[i], embedding.tolist())
+
+        return np.asarray(cached, dtype=np.float32)
@@ -1,9 +1,9 @@
-from typing import List, Dict, Any
-import json
+from typing import List, Dict, Any, Optional
 import os
 import logging
 import groq
 from jobsearch.job_matcher.base import BaseJobMatcher
+from jobsearch.job_matcher.embedding_prefilter import EmbeddingPrefilter
 
 class GroqJobMatcher(BaseJobMatcher):
     """
@@ -14,7 +14,11 @@ class GroqJobMatcher(BaseJobMatcher):
     def __init__(self, candidate_profile: Dict[str, Any],
                  candidate_interests: List[str],
                  api_key: str | None = None,
-                 model: str = "llama3-8b-8192"):
+                 model: str = "llama3-8b-8192",
+                 prefilter: Optional[EmbeddingPrefilter] = None,
+                 cache_path: Optional[str] = ".jobsearch_cache/job_analyses.db",
+                 cache_ttl: Optional[float] = None,
+                 top_k: Optional[int] = None):
         """
         Initialize the Groq job matcher
         
@@ -24,8 +28,13 @@ class GroqJobMatcher(BaseJobMatcher):
             api_key: Groq API key (if None, will look for GROQ_API_KEY environment variable)
             model: Groq model to use (default: llama3-8b-8192)
                 Available models: llama3-8b-8192, llama3-70b-8192, mixtral-8x7b-32768, gemma-7b-it
+            prefilter: Embedding prefilter dropping unrelated jobs before AI analysis (default: none)
+            cache_path: SQLite file caching job analyses (None disables caching)
+            cache_ttl: Seconds before a cached analysis is requested again (default: never)
+            top_k: Maximum number of jobs sent for AI analysis, keeping those with the highest
+                initial match score (default: None, sending every job passing the basic criteria)
         """
-        super().__init__(candidate_profile, candidate_interests)
+        super().__init__(candidate_profile, candidate_interests, prefilter, cache_path, cache_ttl, top_k)
         
         # Get API key from environment variable if not provided
         if api_key is None:
@@ -35,63 +44,76 @@ class GroqJobMatcher(BaseJobMatcher):
                 
         self.api_key = api_key
         self.model = model
-        # Initialize the Groq client
-        self.client = groq.Client(api_key=api_key)
         self.logger = logging.getLogger(self.__class__.__name__)
     
-    def _rank_jobs_with_ai(self, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Use Groq's API to analyze and rank jobs based on candidate fit"""
-        if not jobs:
-            return []
-            
+    def _create_client(self) -> groq.AsyncGroq:
+        """Create an asynchronous Groq client"""
+        return groq.AsyncGroq(api_key=self.api_key, max_retries=self.max_retries)
+
+    async def _complete(self, client: groq.AsyncGroq, prompt: str, max_tokens: int) -> str:
+        """Send a prompt to the Groq model and return the text of its reply"""
+        stream = await client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {
+                    "role": "system", 
+                    "content": "You are a job matching assistant specialized in evaluating job fit for candidates."
+                },
+                {
+                    "role": "user", 
+                    "content": prompt
+                }
+            ],
+            temperature=0,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        
+        # Stop reading, which ends generation, as soon as the JSON object is complete
+        # rather than waiting for any text the model adds after it
+        scanner = _JsonObjectScanner()
+        ai_text = []
         try:
-            ranked_jobs = []
-            
-            for job in jobs:
-                try:
-                    # Prepare prompt for the model
-                    base_prompt = self._prepare_analysis_prompt(job)
-                    
-                    # Call the Groq API using the client
-                    self.logger.info(f"Sending request to Groq API for job: {job['title']}")
-                    
-                    response = self.client.chat.completions.create(
-                        model=self.model,
-                        messages=[
-                            {
-                                "role": "system", 
-                                "content": "You are a job matching assistant specialized in evaluating job fit for candidates."
-                            },
-                            {
-                                "role": "user", 
-                                "content": base_prompt
-                            }
-                        ],
-                        temperature=0.3,
-                        max_tokens=1024
-                    )
-                    
-                    # Extract text from response
-                    ai_text = response.choices[0].message.content
-                    
-                    # Extract the JSON from the response text
-                    ai_analysis = self._extract_json_from_llm_response(ai_text)
-                    
-                    # Add AI analysis to job
-                    job.update(ai_analysis)
-                    ranked_jobs.append(job)
-                    
-                except Exception as e:
-                    self.logger.error(f"Error analyzing job with Groq: {e}")
-                    # Still include the job with a note about the error
-                    job["ai_analysis_error"] = str(e)
-                    ranked_jobs.append(job)
-            
-            # Sort by overall score (descending)
-            ranked_jobs.sort(key=lambda x: x.get("overall_score", 0), reverse=True)
-            return ranked_jobs
-            
-        except Exception as e:
-            self.logger.error(f"Error in Groq ranking process: {e}")
-            # Return original jobs if ranking fails
-            return jobs 
\ No newline at end of file
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+
+                end = scanner.feed(delta)
+                if end != -1:
+                    ai_text.append(delta[:end])
+                    break
+                ai_text.append(delta)
+        finally:
+            await stream.close()
+        
+        return "".join(ai_text)
+
+class _JsonObjectScanner:
+    """Finds where the first JSON object in incrementally received text ends"""
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text: str) -> int:
+        """Scan the next piece of text, returning the index just past the object's closing brace, or -1"""
+        for i, char in enumerate(text):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            # Text before the object, such as a code fence, is skipped
+            elif char == '"' and self.depth:
+                self.in_string = True
+            elif char == "{":
+                self.depth += 1
+            elif char == "}" and self.depth:
+                self.depth -= 1
+                if not self.depth:
+                    return i + 1
+        return -1
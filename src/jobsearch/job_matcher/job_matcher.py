@@ -1,85 +1,180 @@
-from typing import List, Dict, Any
-import openai
-import logging
-import json
+from typing import List, Dict, Any, AsyncIterator, Iterable, Optional, Set, Tuple
+from openai import AsyncOpenAI
+import asyncio
+import orjson
+import os
+from jobsearch.rate_limit import RateLimiter
+from jobsearch.job_board_scraper.linkedin import LinkedInScraper
+from jobsearch.job_matcher.base import BaseJobMatcher
+from jobsearch.job_matcher.embedding_prefilter import EmbeddingPrefilter
 
-class JobMatcher:
-    """Processes raw job listings and matches them to candidate profile"""
+# Models older than JSON mode, which reject the response_format request parameter
+_MODELS_WITHOUT_JSON_MODE = frozenset({
+    "gpt-4", "gpt-4-0314", "gpt-4-0613", "gpt-4-32k", "gpt-4-32k-0314", "gpt-4-32k-0613",
+    "gpt-3.5-turbo-0301", "gpt-3.5-turbo-0613", "gpt-3.5-turbo-16k", "gpt-3.5-turbo-16k-0613"
+})
+
+# pyahocorasick finds every keyword in one pass over a job's text, however many keywords
+# there are. Without it, each keyword is searched for separately
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+class JobMatcher(BaseJobMatcher):
+    """Processes raw job listings and matches them to candidate profile using OpenAI's API"""
+
+    # Maximum number of concurrent requests to the OpenAI API
+    max_concurrency = 20
+    # Jobs evaluated together in one request, sharing a single copy of the candidate profile
+    batch_size = 10
+    # Runs with more jobs than this go through the Batch API, which costs half as much
+    # but may take up to a day. Its progress is polled with exponential backoff
+    batch_api_threshold = 200
+    batch_poll_interval = 30
+    batch_poll_max_interval = 600
+    # Number of interests and skills from which they are found with a single automaton pass
+    # rather than one substring search each, when pyahocorasick is installed
+    keyword_automaton_threshold = 30
     
     def __init__(self, candidate_profile: Dict[str, Any], 
                  candidate_interests: List[str],
-                 openai_api_key: str = None):
-        self.candidate_profile = candidate_profile
-        self.candidate_interests = candidate_interests
-        self.logger = logging.getLogger(self.__class__.__name__)
-        
-        # Set up OpenAI if API key provided
-        if openai_api_key:
-            openai.api_key = openai_api_key
-    
+                 openai_api_key: str = None,
+                 top_k: Optional[int] = 50,
+                 model: str = "gpt-4",
+                 use_batch_api: Optional[bool] = None,
+                 cache_path: Optional[str] = ".jobsearch_cache/job_analyses.db",
+                 cache_ttl: Optional[float] = None,
+                 max_requests_per_minute: Optional[float] = None,
+                 max_tokens_per_minute: Optional[float] = None,
+                 prefilter: Optional[EmbeddingPrefilter] = None,
+                 screening_model: Optional[str] = None,
+                 borderline_scores: Tuple[float, float] = (6, 8)):
+        """
+        Initialize the job matcher
+
+        Args:
+            candidate_profile: Dictionary containing candidate profile information
+            candidate_interests: List of candidate interests as strings
+            openai_api_key: OpenAI API key (if None, will look for OPENAI_API_KEY environment variable)
+            top_k: Maximum number of jobs sent for AI analysis, keeping those with the highest
+                initial match score (None sends every job passing the basic criteria)
+            model: OpenAI model to use (default: gpt-4)
+            use_batch_api: Analyze jobs with OpenAI's Batch API instead of one request per batch of jobs.
+                If None, it is used when JOBSEARCH_USE_BATCH=1 or for more than batch_api_threshold jobs
+            cache_path: SQLite file caching job analyses, so jobs seen in earlier searches are not
+                analyzed again (None disables caching)
+            cache_ttl: Seconds before a cached analysis is requested again (default: never)
+            max_requests_per_minute: Requests per minute allowed by the account's rate limit for the model.
+                Requests are paced to stay below it rather than retried after hitting it (default: unlimited)
+            max_tokens_per_minute: Tokens per minute allowed by the account's rate limit for the model,
+                paced the same way (default: unlimited)
+            prefilter: Embedding prefilter dropping unrelated jobs among those matching keywords,
+                before AI analysis (default: none)
+            screening_model: Cheaper OpenAI model that analyzes every job first, e.g. gpt-4o-mini.
+                Only jobs it gives a borderline overall score, or fails to analyze, are analyzed again with model
+                (default: none)
+            borderline_scores: Lowest and highest screening overall score analyzed again with model
+        """
+        super().__init__(candidate_profile, candidate_interests, prefilter=prefilter, cache_path=cache_path,
+                         cache_ttl=cache_ttl, top_k=top_k)
+        # The key is kept on this matcher's clients rather than set globally on the openai module
+        self.api_key = openai_api_key
+        self.model = model
+        self.use_batch_api = use_batch_api
+        # Each bucket holds a minute's worth of capacity, refilled at the per-minute rate
+        self._request_limiter = (RateLimiter(60 / max_requests_per_minute, max_requests_per_minute)
+                                 if max_requests_per_minute else None)
+        self._token_limiter = (RateLimiter(60 / max_tokens_per_minute, max_tokens_per_minute)
+                               if max_tokens_per_minute else None)
+        # In JSON mode, the model always replies with a bare JSON object
+        self._json_mode = model not in _MODELS_WITHOUT_JSON_MODE
+        # Screening uses a matcher of its own, so its requests, cache entries and JSON mode follow its model
+        self.borderline_scores = borderline_scores
+        self._screener = None
+        if screening_model is not None:
+            self._screener = JobMatcher(
+                candidate_profile, candidate_interests, openai_api_key=openai_api_key, model=screening_model,
+                use_batch_api=use_batch_api, cache_path=cache_path, cache_ttl=cache_ttl,
+                max_requests_per_minute=max_requests_per_minute, max_tokens_per_minute=max_tokens_per_minute
+            )
+        # Created on first use, to fetch the full descriptions of LinkedIn jobs
+        self._linkedin_scraper: Optional[LinkedInScraper] = None
+
+        # Keywords are normalized once, rather than for every job they are checked against.
+        # Blank ones would match every job, and are dropped before either matching strategy sees them
+        self._interest_keywords = self._normalize_keywords(candidate_interests)
+        self._skill_keywords = self._normalize_keywords(candidate_profile.get("skills", []))
+        self._keyword_automaton = None
+        if (ahocorasick is not None and
+                len(self._interest_keywords) + len(self._skill_keywords) >= self.keyword_automaton_threshold):
+            self._keyword_automaton = self._build_keyword_automaton()
+
     def process_jobs(self, raw_jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Process raw job listings and return matches"""
-        
         # Fetch full details for jobs that only have partial information
         enriched_jobs = self._enrich_job_details(raw_jobs)
-        
-        # Check potential matches based on keywords and basic criteria
-        potential_matches = self._filter_basic_criteria(enriched_jobs)
-        
-        # Use AI to rank jobs based on fit with candidate profile
-        ranked_jobs = self._rank_jobs_with_ai(potential_matches)
-        
-        # Return top matches
-        return ranked_jobs
-    
+
+        return super().process_jobs(enriched_jobs)
+
     def _enrich_job_details(self, raw_jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Enrich job listings with full details if needed"""
-        enriched_jobs = []
-        
-        for job in raw_jobs:
-            # Skip jobs that already have good descriptions
-            if len(job.get("description", "")) > 200:
-                enriched_jobs.append(job)
-                continue
-                
-            # For jobs with minimal descriptions, try to fetch more
-            # Note: Implementation would depend on job source
-            # This is a simplified placeholder
+        # No event loop is started when every job already has a good description
+        if self._jobs_to_enrich(raw_jobs):
+            asyncio.run(self._enrich_job_details_async(raw_jobs))
+        return raw_jobs
+
+    async def _enrich_job_details_async(self, raw_jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fetch the full descriptions of jobs with minimal ones concurrently, updating them in place"""
+        linkedin_jobs = self._jobs_to_enrich(raw_jobs)
+
+        if linkedin_jobs:
             try:
-                if job["url"] and job["source"] == "LinkedInScraper":
-                    # Example: could implement fetching full LinkedIn job description
-                    # job = self._fetch_linkedin_details(job)
-                    pass
-                    
+                # The scraper bounds its concurrent requests and keeps to LinkedIn's rate limit
+                if self._linkedin_scraper is None:
+                    self._linkedin_scraper = LinkedInScraper([])
+                await self._linkedin_scraper.enrich_async(linkedin_jobs)
             except Exception as e:
                 self.logger.error(f"Error enriching job details: {e}")
-            
-            enriched_jobs.append(job)
-            
-        return enriched_jobs
+
+        return raw_jobs
+
+    @staticmethod
+    def _jobs_to_enrich(raw_jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return the jobs with minimal descriptions whose full details can be fetched"""
+        # Jobs that already have good descriptions are skipped.
+        # Only LinkedIn job pages can be fetched for now
+        return [
+            job for job in raw_jobs
+            if len(job.get("description", "")) <= 200 and job.get("url") and job.get("source") == "LinkedInScraper"
+        ]
     
     def _filter_basic_criteria(self, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Apply basic filtering criteria"""
+        """Score jobs on matching interests and skills, keeping those scoring at least 2"""
         matches = []
         
-        # Extract requirements from candidate profile
-        experience_years = self.candidate_profile.get("years_experience", 0)
-        skills = self.candidate_profile.get("skills", [])
-        education = self.candidate_profile.get("education", {})
-        
         for job in jobs:
             score = 0
             reasons = []
+
+            # Lowercase each job's text once for all keywords. Interests can match the title
+            # or the description, and the separator stops a match from spanning both
+            description = job["description"].lower()
+            title_and_description = f"{job['title'].lower()}\0{description}"
+            interest_text, skill_text = title_and_description, description
+            if self._keyword_automaton is not None:
+                interest_text, skill_text = self._find_keywords(title_and_description,
+                                                                len(title_and_description) - len(description))
             
             # Check for interest matches
-            for interest in self.candidate_interests:
-                if interest.lower() in job["title"].lower() or interest.lower() in job["description"].lower():
+            for interest, keyword in self._interest_keywords:
+                if keyword in interest_text:
                     score += 2
                     reasons.append(f"Matches interest: {interest}")
             
             # Check for skill matches
-            for skill in skills:
-                if skill.lower() in job["description"].lower():
+            for skill, keyword in self._skill_keywords:
+                if keyword in skill_text:
                     score += 1
                     reasons.append(f"Matches skill: {skill}")
             
@@ -89,103 +184,170 @@ class JobMatcher:
                 job["match_reasons"] = reasons
                 matches.append(job)
         
-        return matches
+        # Only jobs matching keywords are embedded by the prefilter, if there is one
+        return super()._filter_basic_criteria(matches)
+
+    @staticmethod
+    def _normalize_keywords(keywords: List[str]) -> List[Tuple[str, str]]:
+        """Pair each non-blank keyword with its trimmed, lowercased form for matching"""
+        return [(keyword, keyword.strip().lower()) for keyword in keywords if keyword.strip()]
+
+    def _build_keyword_automaton(self) -> "ahocorasick.Automaton":
+        """Build an Aho-Corasick automaton matching every lowercased interest and skill"""
+        automaton = ahocorasick.Automaton()
+        for _, keyword in self._interest_keywords + self._skill_keywords:
+            automaton.add_word(keyword, keyword)
+        automaton.make_automaton()
+        return automaton
+
+    def _find_keywords(self, text: str, description_start: int) -> Tuple[Set[str], Set[str]]:
+        """
+        Find the keywords in a job's lowercased text with a single pass of the keyword automaton
+
+        Returns:
+            The keywords found anywhere in the text, and those found from description_start on
+        """
+        found, found_in_description = set(), set()
+        for end, keyword in self._keyword_automaton.iter(text):
+            found.add(keyword)
+            if end - len(keyword) >= description_start - 1:
+                found_in_description.add(keyword)
+        return found, found_in_description
     
-    def _rank_jobs_with_ai(self, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Use AI to analyze and rank jobs based on candidate fit"""
-        if not jobs:
-            return []
-            
+    async def _analyze_jobs(self, jobs: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """Analyze jobs, with only the borderline results of the screening model analyzed again"""
+        if self._screener is None:
+            async for job in super()._analyze_jobs(jobs):
+                yield job
+            return
+
+        # Clear results are final, while borderline ones wait for model.
+        # So do failed screenings, as their placeholder score says nothing about the job
+        borderline = []
+        low, high = self.borderline_scores
+        async for job in self._screener._analyze_jobs(jobs):
+            score = job.get("overall_score")
+            screened = job.pop("ai_analysis_error", None) is None and isinstance(score, (int, float))
+            if not screened or low <= score <= high:
+                borderline.append(job)
+            else:
+                yield job
+
+        self.logger.info(f"Analyzing {len(borderline)} of {len(jobs)} jobs again with {self.model}")
+        async for job in super()._analyze_jobs(borderline):
+            yield job
+
+    async def _analyze_batches(self, client: AsyncOpenAI, semaphore: asyncio.BoundedSemaphore,
+                               batches: Iterable[List[Dict[str, Any]]]) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Analyze batches of jobs, through the Batch API when it is enabled for this many jobs"""
+        batches = list(batches)
+        if not self._should_use_batch_api(sum(len(batch) for batch in batches)):
+            async for batch in super()._analyze_batches(client, semaphore, batches):
+                yield batch
+            return
+
         try:
-            # Create AI-ready data
-            profile_json = json.dumps(self.candidate_profile, indent=2)
-            interests_json = json.dumps(self.candidate_interests, indent=2)
-            
-            ranked_jobs = []
-            
-            for job in jobs:
-                try:
-                    # Prepare prompt for AI
-                    prompt = f"""
-                    ## Task: Evaluate job fit for candidate
-                    
-                    ### Candidate Profile:
-                    ```json
-                    {profile_json}
-                    ```
-                    
-                    ### Candidate Interests:
-                    ```json
-                    {interests_json}
-                    ```
-                    
-                    ### Job Information:
-                    - Title: {job['title']}
-                    - Company: {job['company']}
-                    - Description: {job['description'][:1000]}...
-                    
-                    ### Analysis Instructions:
-                    1. Evaluate how well this job matches the candidate's experience and skills (scale 1-10)
-                    2. Evaluate how well this job matches the candidate's interests (scale 1-10)
-                    3. Determine whether the candidate would likely receive a first-round interview based on qualifications
-                    4. Provide 2-3 key reasons why this job is a good match or not
-                    
-                    ### Output Format:
-                    Return a JSON with the following structure:
-                    ```json
-                    {
-                        "experience_match_score": 0-10,
-                        "interest_match_score": 0-10,
-                        "interview_probability": 0-10,
-                        "overall_score": 0-10,
-                        "match_reasons": ["reason1", "reason2"],
-                        "summary": "One sentence summary of fit"
-                    }
-                    ```
-                    """
-                    
-                    # Call AI API
-                    response = openai.ChatCompletion.create(
-                        model="gpt-4",  # Use appropriate model
-                        messages=[
-                            {"role": "system", "content": "You are a job matching assistant."},
-                            {"role": "user", "content": prompt}
-                        ],
-                        temperature=0.5,
-                        max_tokens=800
-                    )
-                    
-                    # Parse AI response
-                    ai_text = response.choices[0].message.content
-                    ai_json_str = ai_text.strip()
-                    
-                    # Extract JSON if it's wrapped in backticks
-                    if "```json" in ai_json_str:
-                        start = ai_json_str.find("```json") + 7
-                        end = ai_json_str.find("```", start)
-                        ai_json_str = ai_json_str[start:end].strip()
-                    elif "```" in ai_json_str:
-                        start = ai_json_str.find("```") + 3
-                        end = ai_json_str.find("```", start)
-                        ai_json_str = ai_json_str[start:end].strip()
-                    
-                    ai_analysis = json.loads(ai_json_str)
-                    
-                    # Add AI analysis to job
-                    job.update(ai_analysis)
-                    ranked_jobs.append(job)
-                    
-                except Exception as e:
-                    self.logger.error(f"Error analyzing job with AI: {e}")
-                    # Still include the job with a note about the error
-                    job["ai_analysis_error"] = str(e)
-                    ranked_jobs.append(job)
-            
-            # Sort by overall score (descending)
-            ranked_jobs.sort(key=lambda x: x.get("overall_score", 0), reverse=True)
-            return ranked_jobs
-            
+            replies = await self._run_batch_job(client, batches)
         except Exception as e:
-            self.logger.error(f"Error in AI ranking process: {e}")
-            # Return original jobs if AI ranking fails
-            return jobs
\ No newline at end of file
+            self.logger.error(f"Falling back to direct requests after Batch API error: {e}")
+            async for batch in super()._analyze_batches(client, semaphore, batches):
+                yield batch
+            return
+
+        # Jobs left without an analysis by the batch job are sent as individual requests
+        retry = []
+        for index, batch in enumerate(batches):
+            retry.extend(self._merge_batch_analysis(batch, replies.get(str(index))))
+        await asyncio.gather(*[self._analyze_job(client, semaphore, job) for job in retry])
+
+        for batch in batches:
+            yield batch
+
+    def _should_use_batch_api(self, num_jobs: int) -> bool:
+        """Return whether to analyze num_jobs jobs through the Batch API"""
+        if self.use_batch_api is not None:
+            return self.use_batch_api
+        return os.getenv("JOBSEARCH_USE_BATCH") == "1" or num_jobs > self.batch_api_threshold
+
+    async def _run_batch_job(self, client: AsyncOpenAI, batches: List[List[Dict[str, Any]]]) -> Dict[str, str]:
+        """
+        Submit one Batch API request per batch of jobs and wait for the batch job to finish
+
+        Returns:
+            The reply text of each successful request, keyed by the index of its batch as a string
+        """
+        lines = [
+            orjson.dumps({
+                "custom_id": str(index),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._chat_request(self._prepare_batch_analysis_prompt(batch),
+                                           self._max_tokens_for(len(batch)))
+            })
+            for index, batch in enumerate(batches)
+        ]
+        input_file = await client.files.create(file=("jobs.jsonl", b"\n".join(lines)), purpose="batch")
+        batch_job = await client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        self.logger.info(f"Submitted OpenAI batch {batch_job.id} for {len(batches)} requests")
+
+        delay = self.batch_poll_interval
+        while batch_job.status not in ("completed", "failed", "expired", "cancelled"):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.batch_poll_max_interval)
+            batch_job = await client.batches.retrieve(batch_job.id)
+
+        # An expired batch job still returns the requests it completed
+        if batch_job.output_file_id is None:
+            raise Exception(f"OpenAI batch {batch_job.id} {batch_job.status} without results")
+
+        output = await client.files.content(batch_job.output_file_id)
+        replies = {}
+        for line in output.content.splitlines():
+            result = orjson.loads(line)
+            response = result.get("response") or {}
+            if response.get("status_code") == 200:
+                replies[result["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+        return replies
+
+    def _chat_request(self, prompt: str, max_tokens: int) -> Dict[str, Any]:
+        """Build the chat completion request for an analysis prompt"""
+        request = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": "You are a job matching assistant."},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.5,
+            "max_tokens": max_tokens
+        }
+        if self._json_mode:
+            request["response_format"] = {"type": "json_object"}
+        return request
+
+    def _parse_llm_json(self, ai_text: str) -> Any:
+        """Parse the JSON in the model's reply, raising orjson.JSONDecodeError if it is invalid"""
+        # JSON mode replies need no searching for the JSON inside a code fence
+        if self._json_mode:
+            return orjson.loads(ai_text)
+        return super()._parse_llm_json(ai_text)
+
+    def _create_client(self) -> AsyncOpenAI:
+        """Create an asynchronous OpenAI client"""
+        return AsyncOpenAI(api_key=self.api_key, max_retries=self.max_retries)
+
+    async def _complete(self, client: AsyncOpenAI, prompt: str, max_tokens: int) -> str:
+        """Send a prompt to the OpenAI model and return the text of its reply"""
+        if self._request_limiter is not None:
+            await self._request_limiter.acquire()
+        if self._token_limiter is not None:
+            # Rate limits count the requested max_tokens as well as the prompt,
+            # which takes about one token for every four characters
+            await self._token_limiter.acquire(len(prompt) // 4 + max_tokens)
+        response = await client.chat.completions.create(**self._chat_request(prompt, max_tokens))
+        
+        # Parse AI response
+        return response.choices[0].message.content
@@ -0,0 +1,62 @@
+"""
+Persistent store of the jobs found by the agent, backed by SQLite
+"""
+
+from typing import Any, Dict, List
+import os
+import sqlite3
+import time
+import orjson
+from jobsearch.urls import canonical_job_url
+
+class JobDatabase:
+    """Stores job dictionaries on disk, keyed by their canonical URL"""
+
+    def __init__(self, path: str = "job_database.db"):
+        """
+        Open (or create) a job database
+
+        Args:
+            path: Path of the SQLite database file
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "url TEXT PRIMARY KEY, payload TEXT NOT NULL, first_seen REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def add_new(self, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Store the jobs whose canonical URL isn't in the database yet
+
+        Returns:
+            The jobs that were added, in their original order
+        """
+        new_jobs = []
+        first_seen = time.time()
+        # Inserted in a single transaction, so a run costs one write however many jobs it finds
+        with self._conn:
+            for job in jobs:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO jobs (url, payload, first_seen) VALUES (?, ?, ?)",
+                    (canonical_job_url(job["url"]), orjson.dumps(job).decode(), first_seen)
+                )
+                if cursor.rowcount:
+                    new_jobs.append(job)
+        return new_jobs
+
+    def __contains__(self, url: str) -> bool:
+        return self._conn.execute("SELECT 1 FROM jobs WHERE url = ?", (canonical_job_url(url),)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the underlying database connection"""
+        self._conn.close()
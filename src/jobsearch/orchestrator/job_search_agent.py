@@ -1,19 +1,30 @@
 # main.py - The core orchestrator
 
 import os
-import json
+import asyncio
 import datetime
+import functools
+from typing import Any, Dict, Optional
 import dotenv
+import orjson
 from jobsearch.job_board_scraper import LinkedInScraper
 from jobsearch.job_matcher import GroqJobMatcher
+from jobsearch.orchestrator.job_database import JobDatabase
+
+@functools.lru_cache(maxsize=1)
+def _load_env() -> None:
+    """Load the .env file into the environment, once per process"""
+    dotenv.load_dotenv()
 
 class JobSearchAgent:
-    def __init__(self, config_path: str = "config.json"):
-        # Load configuration
-        with open(config_path, 'r') as f:
-            self.config = json.load(f)
+    def __init__(self, config_path: str = "config.json", config: Optional[Dict[str, Any]] = None):
+        # Load configuration, unless the caller already has it
+        if config is None:
+            with open(config_path, 'rb') as f:
+                config = orjson.loads(f.read())
+        self.config = config
 
-        dotenv.load_dotenv()
+        _load_env()
         
         # Initialize components
         self.job_sources = [
@@ -28,41 +39,81 @@ class JobSearchAgent:
             candidate_interests=self.config["candidate_interests"],
             api_key=os.environ.get("GROQ_API_KEY")
         )
+
+        # Search arguments by source type. LinkedIn results reach the matcher in pages
+        # smaller than the whole search, so that analysis starts while descriptions are fetched.
+        # Pages default to one LLM request's worth of jobs, so their batches aren't under-filled
+        self.search_arguments = {
+            LinkedInScraper: {
+                "limit": self.config.get("search_limit", 10),
+                "page_size": self.config.get("page_size", self.matcher.batch_size)
+            }
+        }
         
-        self.job_database = {}  # Simple in-memory store, replace with proper DB
+        # Jobs found by earlier runs are kept on disk, so only new ones are returned
+        self.job_database = JobDatabase(self.config.get("job_database_path", "job_database.db"))
     
+    # Maximum number of scraped pages of jobs waiting for the matcher
+    max_pending_pages = 4
+
     def run_job_search(self):
         """Execute a complete job search cycle"""
+        return asyncio.run(self.run_job_search_async())
+
+    async def run_job_search_async(self):
+        """
+        Asynchronously execute a complete job search cycle. Pages of jobs are analyzed
+        as soon as they are scraped, so scraping and AI analysis overlap
+        """
         print(f"Starting job search at {datetime.datetime.now()}")
-        
+        pages = asyncio.Queue(maxsize=self.max_pending_pages)
+
         # 1. Collect raw job listings from all sources
-        raw_jobs = []
-        for source in self.job_sources:
+        async def collect(source):
+            count = 0
             try:
-                jobs = source.search()
-                raw_jobs.extend(jobs)
-                print(f"Retrieved {len(jobs)} jobs from {source.__class__.__name__}")
+                async for page in source.search_stream(**self.search_arguments.get(type(source), {})):
+                    count += len(page)
+                    await pages.put([job.to_dict() for job in page])
+                print(f"Retrieved {count} jobs from {source.__class__.__name__}")
             except Exception as e:
                 print(f"Error retrieving jobs from {source.__class__.__name__}: {e}")
-        
-        # 2. Process and filter jobs
-        matching_jobs = self.matcher.process_jobs(raw_jobs)
+
+        async def collect_all():
+            await asyncio.gather(*[collect(source) for source in self.job_sources])
+            await pages.put(None)
+
+        async def scraped_pages():
+            while (page := await pages.get()) is not None:
+                yield page
+
+        # 2. Process and filter each page of jobs while the next ones are scraped.
+        # The matcher keeps deduplication and its analysis budget across pages
+        matching_jobs = []
+        async with asyncio.TaskGroup() as tasks:
+            tasks.create_task(collect_all())
+            page_stream = scraped_pages()
+            try:
+                async for job in self.matcher.stream_job_pages(page_stream):
+                    matching_jobs.append(job)
+            except Exception as e:
+                print(f"Error processing jobs: {e}")
+                # Drain the rest, so that scraping can finish
+                async for _ in page_stream:
+                    pass
+
+        matching_jobs.sort(key=lambda job: job.get("overall_score", 0), reverse=True)
         print(f"Found {len(matching_jobs)} matching jobs after processing")
         
-        # 3. Store new jobs
-        new_jobs = []
-        for job in matching_jobs:
-            job_id = job["url"]  # Using URL as a unique identifier
-            if job_id not in self.job_database:
-                self.job_database[job_id] = job
-                new_jobs.append(job)
+        # 3. Store new jobs, using their canonical URL as a unique identifier
+        new_jobs = self.job_database.add_new(matching_jobs)
         
         return new_jobs
 
-
 # Allow running as script or importing as module
 if __name__ == "__main__":
     agent = JobSearchAgent()
     jobs = agent.run_job_search()
     print(jobs)
-    json.dump(jobs, open("jobs.json", "w"))
\ No newline at end of file
+    with open("jobs.json", "wb") as f:
+        f.write(orjson.dumps(jobs))
\ No newline at end of file
@@ -0,0 +1,27 @@
+"""
+Rate limiting for asyncio tasks
+"""
+
+import asyncio
+import time
+
+class RateLimiter:
+    """
+    Token bucket rate limiter for asyncio tasks.
+    Allows bursts of up to `burst` requests, then one request every `interval` seconds.
+    """
+
+    def __init__(self, interval: float, burst: float = 1):
+        self.interval = interval
+        self.burst = burst
+        # Theoretical time at which the bucket is full again
+        self._full_at = time.monotonic()
+
+    async def acquire(self, tokens: float = 1) -> None:
+        """Wait until enough tokens are available and take them"""
+        now = time.monotonic()
+        full_at = max(self._full_at, now)
+        wait = full_at - now - (self.burst - tokens) * self.interval
+        self._full_at = full_at + tokens * self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
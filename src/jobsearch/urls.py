@@ -0,0 +1,16 @@
+"""
+Helpers for identifying job postings by URL
+"""
+
+from urllib.parse import urlsplit
+
+def canonical_job_url(url: str) -> str:
+    """
+    Return the URL identifying a job posting. LinkedIn adds tracking parameters
+    that differ between searches, so its job URLs are stripped of their query and fragment.
+    Other URLs are returned unchanged, as their query may identify the posting
+    """
+    parts = urlsplit(url)
+    if parts.netloc.endswith("linkedin.com"):
+        return parts._replace(query="", fragment="").geturl()
+    return url